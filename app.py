@@ -1,10 +1,19 @@
+import atexit
+import hashlib
 import logging
 import os
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 import cv2
-from flask import Flask, render_template, request
+from flask import Flask, Request, render_template, request
+from flask.logging import default_handler
 from flask_socketio import SocketIO
 from werkzeug.utils import secure_filename
 
@@ -17,11 +26,92 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
 UPLOAD_FOLDER = "app/uploads"
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Tamanho dos blocos usados para gravar os uploads em disco (1 MiB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Requests acima deste tamanho são recebidos direto em disco (500 KiB)
+UPLOAD_SPOOL_SIZE = 500 * 1024
+# Bytes iniciais do vídeo inspecionados para identificar o formato
+VIDEO_HEADER_SIZE = 4096
+# Assinaturas no início do arquivo: Matroska/WebM, MPEG-PS, MPEG-ES, FLV, Ogg, ASF/WMV
+VIDEO_SIGNATURES = (
+    b"\x1a\x45\xdf\xa3",
+    b"\x00\x00\x01\xba",
+    b"\x00\x00\x01\xb3",
+    b"FLV",
+    b"OggS",
+    b"\x30\x26\xb2\x75\x8e\x66\xcf\x11",
+)
+# Tipos do primeiro box de arquivos ISO BMFF (MP4, MOV, 3GP, M4V)
+BMFF_BOX_TYPES = (b"ftyp", b"moov", b"mdat", b"free", b"wide")
+
+
+class UploadRequest(Request):
+    """
+    Request que recebe uploads grandes em arquivos temporários nomeados.
+
+    Os arquivos são criados dentro de UPLOAD_FOLDER, no mesmo sistema de
+    arquivos do destino final, para que save_upload() possa apenas criar um
+    link para eles em vez de copiar o conteúdo.
+    """
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        if total_content_length is None or total_content_length > UPLOAD_SPOOL_SIZE:
+            return tempfile.NamedTemporaryFile(
+                "rb+", dir=UPLOAD_FOLDER, prefix=".upload-"
+            )
+
+        return super()._get_file_stream(
+            total_content_length, content_type, filename, content_length
+        )
+
+
+app.request_class = UploadRequest
 
 # Configuração de logs
 LOG_FOLDER = "app/logs"
 os.makedirs(LOG_FOLDER, exist_ok=True)
 
+# Configuração da detecção
+# Fator de redução da pirâmide: a busca grosseira roda em frames 4x menores
+PYRAMID_SCALE = 4
+# Menor lado (em pixels) do template reduzido para que a pirâmide seja usada
+PYRAMID_MIN_SIZE = 8
+# Fração do threshold que um candidato grosseiro precisa atingir para ser confirmado
+PYRAMID_COARSE_RATIO = 0.9
+# Método de correspondência. TM_CCORR_NORMED dispensa a subtração da média, mas
+# perde a invariância a brilho; o threshold é convertido por match_threshold()
+MATCH_METHOD = cv2.TM_CCOEFF_NORMED
+# Quantidade de templates decodificados mantidos em cache
+TEMPLATE_CACHE_SIZE = 32
+# Restringe a busca à região do último candidato próximo do threshold. Como
+# cada thread de correspondência mantém sua própria região, o frame reportado
+# pode sair alguns frames atrasado e variar entre execuções
+ROI_TRACKING = False
+# Margem, em pixels, da região analisada ao redor do último candidato
+ROI_MARGIN = 64
+# Frames analisados só na região candidata antes de voltar ao frame inteiro
+ROI_REFRESH = 4
+# Intervalo de amostragem: apenas 1 a cada FRAME_STRIDE frames é analisado
+FRAME_STRIDE = 5
+# Variação mínima (em níveis de cinza) de algum pixel em relação ao último frame
+# analisado para que o matchTemplate seja executado (0 desativa)
+FRAME_DIFF_CUTOFF = 4
+# Threads que executam o matchTemplate enquanto outra decodifica o vídeo
+MATCH_WORKERS = 2
+# Frames decodificados aguardando análise (limita o uso de memória)
+FRAME_QUEUE_SIZE = 4
+# Intervalo mínimo, em segundos, entre eventos de progresso enviados ao cliente
+PROGRESS_INTERVAL = 0.5
+# Threads internas do OpenCV por chamada, divididas entre as threads de
+# correspondência para não disputar os núcleos (máximo de 8)
+OPENCV_THREADS = max(1, min(8, (os.cpu_count() or 1) // MATCH_WORKERS))
+
+# Garante os caminhos otimizados (IPP/SIMD) e limita o paralelismo do OpenCV
+cv2.setUseOptimized(True)
+cv2.setNumThreads(OPENCV_THREADS)
+
 
 # Configuração do sistema de logging
 def setup_logging():
@@ -34,13 +124,18 @@ def setup_logging():
     de console envia logs para o console. O registrador principal é definido como nível DEBUG,
     enquanto o registro detalhado para SocketIO, EngineIO e Werkzeug é
     desativado ao definir seus níveis de log como WARNING.
+
+    Os manipuladores não são chamados diretamente pelas threads que registram
+    os logs: o registrador principal apenas enfileira os registros em um
+    QueueHandler, e um QueueListener em thread própria faz a formatação e a
+    escrita. O arquivo de log só é aberto na primeira escrita.
     """
     log_format = "%(asctime)s - %(levelname)s - %(message)s"
     log_file = os.path.join(LOG_FOLDER, "template_detector.log")
 
     # Handler para arquivo com rotação (10 arquivos de 1MB cada)
     file_handler = RotatingFileHandler(
-        log_file, maxBytes=1024 * 1024, backupCount=10, encoding="utf-8"
+        log_file, maxBytes=1024 * 1024, backupCount=10, encoding="utf-8", delay=True
     )
     file_handler.setFormatter(logging.Formatter(log_format))
     file_handler.setLevel(logging.INFO)
@@ -50,10 +145,18 @@ def setup_logging():
     console_handler.setFormatter(logging.Formatter(log_format))
     console_handler.setLevel(logging.DEBUG)
 
-    # Configuração do logger principal
+    # Configuração do logger principal (escrita feita pela thread do listener)
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Remove o handler padrão do Flask (stderr síncrono e linhas duplicadas)
+    app.logger.removeHandler(default_handler)
     app.logger.setLevel(logging.DEBUG)
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(console_handler)
+    app.logger.addHandler(QueueHandler(log_queue))
 
     # Desabilitar log verbose do SocketIO
     logging.getLogger("socketio").setLevel(logging.WARNING)
@@ -64,6 +167,27 @@ def setup_logging():
 setup_logging()
 
 
+def cuda_device_available():
+    """
+    Verifica se o OpenCV foi compilado com suporte a CUDA e se há uma GPU disponível.
+
+    Returns:
+        bool: True se ao menos um dispositivo CUDA puder ser usado para o
+        matchTemplate (módulo cudaimgproc)
+    """
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0 and hasattr(
+            cv2.cuda, "createTemplateMatching"
+        )
+    except (AttributeError, cv2.error):
+        return False
+
+
+# Aceleração por GPU (requer OpenCV compilado com CUDA; senão usa a CPU)
+CUDA_AVAILABLE = cuda_device_available()
+CUDA_DECODE_AVAILABLE = CUDA_AVAILABLE and hasattr(cv2, "cudacodec")
+
+
 @app.route("/")
 def index():
     """
@@ -79,6 +203,89 @@ def index():
     return render_template("index.html")
 
 
+def save_upload(file, path):
+    """
+    Grava um arquivo recebido no upload sem copiar o conteúdo quando possível.
+
+    Se o upload já está em um arquivo temporário em disco (ver UploadRequest),
+    o destino é criado como um hard link para ele, sem ler nem escrever os
+    bytes novamente. Caso contrário, o stream é copiado em blocos de
+    UPLOAD_CHUNK_SIZE, em vez dos blocos de 16 KiB de FileStorage.save().
+
+    Args:
+        file (werkzeug.datastructures.FileStorage): Arquivo recebido no request
+        path (str): Caminho de destino
+    """
+    # Sempre cria um novo arquivo, para que a limpeza pendente de um upload
+    # anterior com o mesmo nome não o remova (ver cleanup_files)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+    stream_path = getattr(file.stream, "name", None)
+
+    if isinstance(stream_path, str) and os.path.isfile(stream_path):
+        try:
+            # O temporário é removido ao fim do request; o link mantém os dados
+            os.link(stream_path, path)
+            return
+        except OSError as e:
+            app.logger.warning("Falha ao criar link do upload, copiando: %s", e)
+
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.stream, f, length=UPLOAD_CHUNK_SIZE)
+
+
+def is_video(stream):
+    """
+    Verifica pelos bytes iniciais (magic bytes) se o stream contém um vídeo.
+
+    Apenas os primeiros VIDEO_HEADER_SIZE bytes são lidos e o stream volta à
+    posição inicial, de modo que arquivos inválidos são recusados sem serem
+    gravados nem decodificados.
+
+    Args:
+        stream (file-like): Stream do arquivo enviado
+
+    Returns:
+        bool: True se o cabeçalho corresponde a um contêiner de vídeo conhecido
+    """
+    head = stream.read(VIDEO_HEADER_SIZE)
+    stream.seek(0)
+
+    if head.startswith(VIDEO_SIGNATURES) or head[4:8] in BMFF_BOX_TYPES:
+        return True
+
+    # AVI: contêiner RIFF do tipo "AVI "
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return True
+
+    # MPEG-TS: pacotes de 188 bytes iniciados pelo byte de sincronismo 0x47
+    return len(head) > 188 and head[0] == head[188] == 0x47
+
+
+def file_digest(stream):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo enviado.
+
+    O stream é lido em blocos de UPLOAD_CHUNK_SIZE e volta à posição inicial.
+
+    Args:
+        stream (file-like): Stream do arquivo enviado
+
+    Returns:
+        str: Digest hexadecimal do conteúdo
+    """
+    digest = hashlib.sha256()
+
+    for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""):
+        digest.update(chunk)
+
+    stream.seek(0)
+    return digest.hexdigest()
+
+
 @app.route("/upload", methods=["POST"])
 def upload():
     """
@@ -92,6 +299,7 @@ def upload():
     Returns:
         tuple: Mensagem de status e código HTTP:
             - ("Processing started", 200) em caso de sucesso
+            - ("Formato de vídeo não suportado", 415) se o vídeo não for reconhecido
             - Mensagens de erro com códigos 400 ou 500 em caso de falha
 
     Raises:
@@ -124,7 +332,7 @@ def upload():
 
             if not 0 <= threshold <= 1:
                 raise ValueError
-        
+
         except ValueError:
             app.logger.warning(
                 f"Threshold inválido recebido: {request.form.get('threshold')}"
@@ -135,18 +343,31 @@ def upload():
             f"Parâmetros recebidos - Video: {video.filename}, Template: {template.filename}, Threshold: {threshold}"
         )
 
+        # Recusar formatos inválidos antes de gravar qualquer arquivo
+        if not is_video(video.stream):
+            app.logger.error(f"Formato de vídeo não suportado: {video.filename}")
+            return "Formato de vídeo não suportado", 415
+
         # Salvar arquivos
         video_path = os.path.join(UPLOAD_FOLDER, secure_filename(video.filename))
         template_path = os.path.join(UPLOAD_FOLDER, secure_filename(template.filename))
 
-        video.save(video_path)
-        template.save(template_path)
+        template_digest = file_digest(template.stream)
+        save_upload(video, video_path)
+        save_upload(template, template_path)
+        # Identidade dos arquivos gravados, usada pela limpeza em segundo plano
+        uploads = [(path, file_id(path)) for path in (video_path, template_path)]
 
         app.logger.info(f"Arquivos salvos em: {video_path} e {template_path}")
 
         # Iniciar processamento em thread separada
         socketio.start_background_task(
-            process_video, video_path, template_path, threshold
+            process_video,
+            video_path,
+            template_path,
+            threshold,
+            template_digest,
+            uploads,
         )
 
         app.logger.info("Processamento iniciado em thread separada")
@@ -157,7 +378,676 @@ def upload():
         return f"Erro no servidor: {str(e)}", 500
 
 
-def process_video(video_path, template_path, threshold):
+def match_threshold(threshold, method):
+    """
+    Converte o threshold do usuário para a escala do método de correspondência.
+
+    O threshold da interface é calibrado para TM_CCOEFF_NORMED. Como
+    TM_CCORR_NORMED reporta scores absolutos mais altos para conteúdos
+    semelhantes, o valor é comprimido para a faixa próxima de 1.
+
+    Args:
+        threshold (float): Threshold informado (0-1)
+        method (int): Método do cv2.matchTemplate
+
+    Returns:
+        float: Threshold equivalente na escala do método
+    """
+    if method == cv2.TM_CCORR_NORMED:
+        return 0.9 + 0.1 * (threshold - 0.8)
+    return threshold
+
+
+# Valor padrão de template_small: o nível reduzido ainda não foi calculado
+# (None significa que a pirâmide não deve ser usada)
+_PYRAMID_UNSET = object()
+
+
+def pyramid_template(template):
+    """
+    Reduz o template para o nível grosseiro da pirâmide.
+
+    Templates com textura fina podem não sobreviver à redução: quando a
+    cópia no frame não está alinhada à grade de PYRAMID_SCALE pixels, o
+    frame reduzido deixa de se parecer com o template reduzido. Por isso a
+    própria cópia exata do template é reduzida em todos os deslocamentos de
+    0 a PYRAMID_SCALE - 1 pixels, e a pirâmide só é usada se o pior score
+    grosseiro ainda passar pelo corte de PYRAMID_COARSE_RATIO.
+
+    Args:
+        template (numpy.ndarray): Template em tons de cinza
+
+    Returns:
+        numpy.ndarray | None: Template reduzido por PYRAMID_SCALE, ou None se
+        ele ficaria menor que PYRAMID_MIN_SIZE ou não sobrevive à redução
+        (a busca é feita em resolução total)
+    """
+    h, w = template.shape
+    s = PYRAMID_SCALE
+
+    if min(w, h) // s < PYRAMID_MIN_SIZE:
+        return None
+
+    template_small = cv2.resize(
+        template, (w // s, h // s), interpolation=cv2.INTER_AREA
+    )
+
+    # Auto-correspondência grosseira em cada deslocamento fora da grade
+    canvas = cv2.copyMakeBorder(template, s, s, s, s, cv2.BORDER_REFLECT)
+    cutoff = match_threshold(1.0, MATCH_METHOD) * PYRAMID_COARSE_RATIO
+
+    for dy in range(s):
+        for dx in range(s):
+            shifted = canvas[dy : dy + h + s, dx : dx + w + s]
+            shifted_small = cv2.resize(
+                shifted, None, fx=1 / s, fy=1 / s, interpolation=cv2.INTER_AREA
+            )
+            res = cv2.matchTemplate(shifted_small, template_small, MATCH_METHOD)
+            _, max_val, _, _ = cv2.minMaxLoc(res)
+
+            if max_val < cutoff:
+                return None
+
+    return template_small
+
+
+# Templates decodificados, indexados pelo digest do conteúdo (ordem de uso)
+template_cache = OrderedDict()
+template_cache_lock = threading.Lock()
+
+
+def load_template(path, digest=None):
+    """
+    Carrega o template em tons de cinza, reaproveitando decodificações anteriores.
+
+    Os uploads recebem um novo arquivo a cada envio, então o cache é indexado
+    pelo digest do conteúdo (ver file_digest) e não pelo caminho: o mesmo
+    template enviado novamente não é decodificado nem reduzido de novo. São
+    mantidos os TEMPLATE_CACHE_SIZE templates usados mais recentemente.
+
+    Args:
+        path (str): Caminho para a imagem template
+        digest (str, optional): Digest do conteúdo do arquivo; sem ele o
+            template é sempre decodificado
+
+    Returns:
+        tuple: (template, template_small) somente leitura, com o template
+        reduzido de pyramid_template(); (None, None) se a imagem não puder
+        ser lida
+    """
+    if digest is not None:
+        with template_cache_lock:
+            if digest in template_cache:
+                template_cache.move_to_end(digest)
+                return template_cache[digest]
+
+    template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+
+    if template is None:
+        return None, None
+
+    template_small = pyramid_template(template)
+    template.flags.writeable = False
+    if template_small is not None:
+        template_small.flags.writeable = False
+
+    if digest is not None:
+        with template_cache_lock:
+            template_cache[digest] = (template, template_small)
+            while len(template_cache) > TEMPLATE_CACHE_SIZE:
+                template_cache.popitem(last=False)
+
+    return template, template_small
+
+
+class TemplateMatcher:
+    """
+    Localiza um template em frames em tons de cinza usando uma pirâmide de imagens.
+
+    A busca é feita primeiro em versões reduzidas do frame e do template
+    (fator PYRAMID_SCALE). Somente quando o pico grosseiro atinge uma fração
+    do threshold a correspondência é confirmada em resolução total, em uma
+    janela ao redor do candidato. Templates pequenos demais para serem
+    reduzidos são buscados diretamente em resolução total.
+
+    Com ROI_TRACKING ativo, quando um frame tem um candidato próximo do
+    threshold, os frames seguintes são analisados apenas em uma região ao
+    redor dele (ROI_MARGIN pixels), aproveitando a localidade temporal do
+    vídeo.
+
+    Args:
+        template (numpy.ndarray): Template em tons de cinza
+        threshold (float): Limiar de correspondência (0-1)
+        template_small (numpy.ndarray | None, optional): Resultado de
+            pyramid_template() (None desativa a pirâmide); calculado a partir
+            de `template` se omitido
+    """
+
+    def __init__(self, template, threshold, template_small=_PYRAMID_UNSET):
+        self.template = template
+        self.method = MATCH_METHOD
+        self.threshold = match_threshold(threshold, self.method)
+        self.scale = PYRAMID_SCALE
+        self.h, self.w = template.shape
+
+        if template_small is _PYRAMID_UNSET:
+            template_small = pyramid_template(template)
+        self.template_small = template_small
+
+        # Buffers reaproveitados entre frames para evitar alocações por chamada
+        self._gray_small = None
+        self._res_small = None
+        self._res = None
+
+        # Região candidata (posição do último pico próximo do threshold)
+        self._roi = None
+        self._roi_misses = 0
+
+    def match(self, gray):
+        """
+        Verifica se o template aparece no frame.
+
+        Com ROI_TRACKING ativo, enquanto houver uma região candidata recente,
+        apenas ela é analisada; o frame inteiro volta a ser analisado após
+        ROI_REFRESH frames sem acerto na região.
+
+        Args:
+            gray (numpy.ndarray): Frame em tons de cinza
+
+        Returns:
+            bool: True se o template foi encontrado com score >= threshold
+        """
+        if self.tracking:
+            x, y = self._roi
+            x0 = max(x - ROI_MARGIN, 0)
+            y0 = max(y - ROI_MARGIN, 0)
+            region = gray[y0 : y + self.h + ROI_MARGIN, x0 : x + self.w + ROI_MARGIN]
+
+            found, candidate = self._search(region)
+            if found:
+                return True
+
+            self._roi_misses += 1
+            if candidate is not None:
+                self._roi = (x0 + candidate[0], y0 + candidate[1])
+            return False
+
+        found, self._roi = self._search(gray)
+        self._roi_misses = 0
+        return found
+
+    @property
+    def tracking(self):
+        """
+        Indica se o próximo frame será analisado apenas na região candidata.
+
+        Returns:
+            bool: True enquanto a busca estiver restrita à região candidata
+        """
+        return ROI_TRACKING and self._roi is not None and self._roi_misses < ROI_REFRESH
+
+    def _search(self, gray):
+        """
+        Procura o template em uma imagem (frame inteiro ou região).
+
+        Args:
+            gray (numpy.ndarray): Imagem em tons de cinza
+
+        Returns:
+            tuple: (found, candidate), em que candidate é a posição (x, y) do
+            melhor pico com score >= threshold * PYRAMID_COARSE_RATIO, ou None
+        """
+        if self.template_small is None:
+            self._res = cv2.matchTemplate(
+                gray, self.template, self.method, result=self._res
+            )
+            _, max_val, _, max_loc = cv2.minMaxLoc(self._res)
+
+            if max_val < self.threshold * PYRAMID_COARSE_RATIO:
+                return False, None
+            return max_val >= self.threshold, max_loc
+
+        # Busca grosseira no nível reduzido da pirâmide
+        s = self.scale
+        self._gray_small = cv2.resize(
+            gray,
+            None,
+            dst=self._gray_small,
+            fx=1 / s,
+            fy=1 / s,
+            interpolation=cv2.INTER_AREA,
+        )
+        self._res_small = cv2.matchTemplate(
+            self._gray_small, self.template_small, self.method, result=self._res_small
+        )
+        _, max_val, _, max_loc = cv2.minMaxLoc(self._res_small)
+
+        if max_val < self.threshold * PYRAMID_COARSE_RATIO:
+            return False, None
+
+        # Confirmação em resolução total numa janela ao redor do candidato
+        frame_h, frame_w = gray.shape
+        x0 = min(max(max_loc[0] * s - s, 0), frame_w - self.w)
+        y0 = min(max(max_loc[1] * s - s, 0), frame_h - self.h)
+        window = gray[y0 : y0 + self.h + 2 * s, x0 : x0 + self.w + 2 * s]
+
+        self._res = cv2.matchTemplate(
+            window, self.template, self.method, result=self._res
+        )
+        _, max_val, _, max_loc = cv2.minMaxLoc(self._res)
+        return max_val >= self.threshold, (x0 + max_loc[0], y0 + max_loc[1])
+
+
+class FrameChangeFilter:
+    """
+    Descarta frames praticamente idênticos ao último frame analisado.
+
+    Compara os frames em resolução total: se nenhum pixel variou
+    FRAME_DIFF_CUTOFF níveis de cinza ou mais desde o último frame analisado
+    (que não teve acerto), o matchTemplate é dispensado. A comparação não é
+    exata: variações menores que FRAME_DIFF_CUTOFF ainda alteram levemente o
+    score, e um frame cujo score fique muito próximo do threshold pode ser
+    descartado. Com FRAME_DIFF_CUTOFF = 0 todos os frames são analisados.
+    """
+
+    def __init__(self):
+        self._reference = None
+
+    def changed(self, gray):
+        """
+        Verifica se o frame mudou desde o último frame analisado.
+
+        Args:
+            gray (numpy.ndarray): Frame em tons de cinza
+
+        Returns:
+            bool: True se o frame deve ser analisado; ele passa então a ser a
+            nova referência
+        """
+        if FRAME_DIFF_CUTOFF <= 0:
+            return True
+
+        if self._reference is None:
+            self._reference = gray.copy()
+            return True
+
+        if cv2.norm(gray, self._reference, cv2.NORM_INF) < FRAME_DIFF_CUTOFF:
+            return False
+
+        # O buffer de `gray` volta para a fila de reuso; a referência é copiada
+        self._reference[...] = gray
+        return True
+
+
+class CudaTemplateMatcher:
+    """
+    Localiza um template em frames em tons de cinza usando a GPU.
+
+    O template é enviado para a memória da GPU uma única vez. A cada frame
+    apenas a imagem em tons de cinza é transferida; o matchTemplate e a busca
+    do pico rodam na GPU.
+
+    Args:
+        template (numpy.ndarray): Template em tons de cinza
+        threshold (float): Limiar de correspondência (0-1)
+        template_small (numpy.ndarray, optional): Ignorado; a busca na GPU é
+            feita em resolução total
+    """
+
+    def __init__(self, template, threshold, template_small=None):
+        self.method = MATCH_METHOD
+        self.threshold = match_threshold(threshold, self.method)
+        self._matcher = cv2.cuda.createTemplateMatching(cv2.CV_8UC1, self.method)
+
+        self._gpu_template = cv2.cuda_GpuMat()
+        self._gpu_template.upload(template)
+        self._gpu_gray = cv2.cuda_GpuMat()
+        self._gpu_res = cv2.cuda_GpuMat()
+
+        # A busca na GPU sempre cobre o frame inteiro (ver TemplateMatcher)
+        self.tracking = False
+
+    def match(self, gray):
+        """
+        Envia o frame para a GPU e verifica se o template aparece nele.
+
+        Args:
+            gray (numpy.ndarray): Frame em tons de cinza
+
+        Returns:
+            bool: True se o template foi encontrado com score >= threshold
+        """
+        self._gpu_gray.upload(gray)
+        return self.match_gpu(self._gpu_gray)
+
+    def match_gpu(self, gpu_gray):
+        """
+        Verifica se o template aparece em um frame que já está na GPU.
+
+        Args:
+            gpu_gray (cv2.cuda.GpuMat): Frame em tons de cinza na memória da GPU
+
+        Returns:
+            bool: True se o template foi encontrado com score >= threshold
+        """
+        self._gpu_res = self._matcher.match(gpu_gray, self._gpu_template, self._gpu_res)
+        _, max_val, _, _ = cv2.cuda.minMaxLoc(self._gpu_res)
+        return max_val >= self.threshold
+
+
+def _ack():
+    """
+    Callback de confirmação dos eventos emitidos via Socket.IO.
+    """
+    app.logger.debug("Confirmação de recebimento do cliente")
+
+
+class ProgressReporter:
+    """
+    Emite o progresso do processamento via Socket.IO em intervalos de tempo.
+
+    Envia no máximo um evento processing_progress a cada PROGRESS_INTERVAL
+    segundos, independentemente da quantidade de frames analisados.
+
+    Args:
+        total_frames (int): Total de frames do vídeo
+    """
+
+    def __init__(self, total_frames):
+        self.total_frames = total_frames
+        self._last_emit = time.monotonic()
+
+    def __call__(self, frame_num):
+        """
+        Registra o frame atual e emite o progresso se o intervalo já passou.
+
+        Args:
+            frame_num (int): Último frame decodificado
+        """
+        now = time.monotonic()
+        if now - self._last_emit < PROGRESS_INTERVAL:
+            return
+
+        self._last_emit = now
+        app.logger.debug("Progresso: frame %d de %d", frame_num, self.total_frames)
+        socketio.emit(
+            "processing_progress",
+            {"frame": frame_num, "total_frames": self.total_frames},
+        )
+
+
+def read_frames(cap, frames, spare, stop_event, on_progress=None):
+    """
+    Decodifica o vídeo e enfileira os frames amostrados em tons de cinza.
+
+    Executada em uma thread própria para que a decodificação ocorra em
+    paralelo ao matchTemplate. Buffers devolvidos pelos consumidores em
+    `spare` são reaproveitados na conversão para tons de cinza.
+
+    Args:
+        cap (cv2.VideoCapture): Vídeo já aberto
+        frames (queue.Queue): Fila de saída com tuplas (frame_num, gray)
+        spare (queue.Queue): Buffers em tons de cinza livres para reuso
+        stop_event (threading.Event): Sinaliza que a leitura deve parar
+        on_progress (callable, optional): Chamado com o número de cada frame
+            amostrado (ver ProgressReporter)
+    """
+    frame = None
+    frame_num = 0
+    grab = cap.grab
+    skip = FRAME_STRIDE - 1
+
+    try:
+        # grab() retorna False no fim do vídeo; cap.isOpened() não muda no loop
+        while not stop_event.is_set():
+            if not grab():
+                break
+
+            frame_num += 1
+            ret, frame = cap.retrieve(frame)
+            if not ret:
+                break
+
+            try:
+                gray = spare.get_nowait()
+            except queue.Empty:
+                gray = None
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+            frames.put((frame_num, gray))
+
+            if on_progress is not None:
+                on_progress(frame_num)
+
+            # grab() avança o decodificador sem converter o frame para BGR
+            skipped = 0
+            while skipped < skip and grab():
+                skipped += 1
+            frame_num += skipped
+    finally:
+        # Um marcador de fim para cada consumidor
+        for _ in range(MATCH_WORKERS):
+            frames.put(None)
+
+
+def match_frames(matcher, change_filter, frames, spare, hits, stop_event):
+    """
+    Consome frames da fila e registra aqueles em que o template é encontrado.
+
+    Frames posteriores a um acerto já registrado são descartados sem análise,
+    mas os anteriores continuam sendo analisados para que o menor frame seja
+    reportado. Frames sem mudança desde o último analisado também são
+    descartados (ver FrameChangeFilter), exceto enquanto o matcher busca
+    apenas na região candidata: um frame analisado só parcialmente não pode
+    servir de referência ao filtro. A fila é sempre esvaziada até o marcador
+    de fim, mesmo após um erro, para não bloquear a thread de leitura.
+
+    Args:
+        matcher (TemplateMatcher): Matcher exclusivo desta thread
+        change_filter (FrameChangeFilter): Filtro exclusivo desta thread
+        frames (queue.Queue): Fila de entrada com tuplas (frame_num, gray)
+        spare (queue.Queue): Recebe os buffers já analisados para reuso
+        hits (list): Números dos frames em que o template foi encontrado
+        stop_event (threading.Event): Sinalizado ao encontrar o template ou em erro
+
+    Raises:
+        Exception: Repassa o primeiro erro ocorrido durante a correspondência
+    """
+    error = None
+
+    while (item := frames.get()) is not None:
+        frame_num, gray = item
+
+        if error is None and not (hits and min(hits) < frame_num):
+            try:
+                analyze = matcher.tracking or change_filter.changed(gray)
+                if analyze and matcher.match(gray):
+                    hits.append(frame_num)
+                    stop_event.set()
+            except Exception as e:
+                error = e
+                stop_event.set()
+
+        spare.put(gray)
+
+    if error is not None:
+        raise error
+
+
+def scan_video(
+    cap, template, threshold, on_progress=None, template_small=_PYRAMID_UNSET
+):
+    """
+    Procura o template no vídeo sobrepondo decodificação e correspondência.
+
+    Uma thread decodifica os frames amostrados enquanto MATCH_WORKERS threads
+    executam o matchTemplate (que libera o GIL). A fila entre elas é limitada
+    a FRAME_QUEUE_SIZE frames. Havendo GPU, a correspondência é feita com
+    CudaTemplateMatcher.
+
+    Args:
+        cap (cv2.VideoCapture): Vídeo já aberto
+        template (numpy.ndarray): Template em tons de cinza
+        threshold (float): Limiar de correspondência (0-1)
+        on_progress (callable, optional): Chamado com o número de cada frame
+            amostrado
+        template_small (numpy.ndarray | None, optional): Resultado de
+            pyramid_template(), repassado aos matchers; calculado por cada
+            matcher se omitido
+
+    Returns:
+        int | None: Primeiro frame em que o template foi encontrado, ou None
+    """
+    frames = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    spare = queue.Queue()
+    stop_event = threading.Event()
+    hits = []
+    matcher_class = CudaTemplateMatcher if CUDA_AVAILABLE else TemplateMatcher
+
+    # Criados antes de iniciar a leitura: se um construtor falhar, nenhuma
+    # thread fica bloqueada na fila sem consumidores
+    workers = [
+        (
+            matcher_class(template, threshold, template_small),
+            FrameChangeFilter(),
+        )
+        for _ in range(MATCH_WORKERS)
+    ]
+
+    with ThreadPoolExecutor(max_workers=MATCH_WORKERS + 1) as executor:
+        futures = [
+            executor.submit(read_frames, cap, frames, spare, stop_event, on_progress)
+        ]
+        futures += [
+            executor.submit(
+                match_frames,
+                matcher,
+                change_filter,
+                frames,
+                spare,
+                hits,
+                stop_event,
+            )
+            for matcher, change_filter in workers
+        ]
+
+        for future in futures:
+            future.result()
+
+    return min(hits) if hits else None
+
+
+def scan_video_cuda(video_path, template, threshold, on_progress=None):
+    """
+    Procura o template no vídeo decodificando e comparando os frames na GPU.
+
+    Os frames são decodificados pelo decodificador de hardware (NVDEC) via
+    cv2.cudacodec e permanecem na memória da GPU durante a conversão para
+    tons de cinza, o matchTemplate e a busca do pico.
+
+    Args:
+        video_path (str): Caminho para o arquivo de vídeo
+        template (numpy.ndarray): Template em tons de cinza
+        threshold (float): Limiar de correspondência (0-1)
+        on_progress (callable, optional): Chamado com o número de cada frame
+            amostrado
+
+    Returns:
+        int | None: Primeiro frame em que o template foi encontrado, ou None
+
+    Raises:
+        cv2.error: Se o vídeo não puder ser decodificado na GPU
+    """
+    reader = cv2.cudacodec.createVideoReader(video_path)
+    matcher = CudaTemplateMatcher(template, threshold)
+    gpu_gray = cv2.cuda_GpuMat()
+    frame_num = 0
+
+    while True:
+        ret, gpu_frame = reader.nextFrame()
+        if not ret:
+            break
+
+        frame_num += 1
+        if (frame_num - 1) % FRAME_STRIDE:
+            continue
+
+        # O cudacodec entrega os frames em BGRA
+        gpu_gray = cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGRA2GRAY, dst=gpu_gray)
+
+        if matcher.match_gpu(gpu_gray):
+            return frame_num
+
+        if on_progress is not None:
+            on_progress(frame_num)
+
+    return None
+
+
+# Arquivos aguardando remoção pela thread de limpeza
+cleanup_queue = queue.Queue()
+
+
+def file_id(path):
+    """
+    Identifica um arquivo pelo dispositivo, inode e data de modificação.
+
+    A data de modificação distingue um novo arquivo que reaproveitou o inode
+    de um arquivo removido.
+
+    Args:
+        path (str): Caminho do arquivo
+
+    Returns:
+        tuple | None: (st_dev, st_ino, st_mtime_ns), ou None se o arquivo não
+        existir
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns
+
+
+def cleanup_files():
+    """
+    Remove em segundo plano os arquivos enfileirados em cleanup_queue.
+
+    Executada em uma thread daemon para que a remoção dos uploads (que pode
+    levar alguns milissegundos para arquivos grandes) não atrase a thread de
+    processamento. Cada item da fila é uma lista de tuplas (caminho, file_id)
+    registradas logo após o upload; arquivos que já foram substituídos por um
+    novo upload com o mesmo nome são mantidos.
+
+    Logs:
+        - INFO: Arquivos removidos
+        - WARNING: Falha ao remover algum arquivo
+    """
+    while True:
+        files = cleanup_queue.get()
+        removed = []
+
+        for path, uploaded_id in files:
+            if uploaded_id is not None and file_id(path) != uploaded_id:
+                continue
+
+            try:
+                os.remove(path)
+                removed.append(path)
+            except Exception as e:
+                app.logger.warning("Erro ao remover arquivos temporários: %s", e)
+
+        if removed:
+            app.logger.info("Arquivos temporários removidos: %s", ", ".join(removed))
+
+
+threading.Thread(target=cleanup_files, name="cleanup", daemon=True).start()
+
+
+def process_video(
+    video_path, template_path, threshold, template_digest=None, uploads=None
+):
     """
     Processa o vídeo para encontrar o template usando correspondência de padrões.
 
@@ -165,105 +1055,115 @@ def process_video(video_path, template_path, threshold):
         video_path (str): Caminho para o arquivo de vídeo
         template_path (str): Caminho para a imagem template
         threshold (float): Limiar de correspondência (0-1)
+        template_digest (str, optional): Digest do conteúdo do template, usado
+            como chave do cache de templates (ver load_template)
+        uploads (list, optional): Tuplas (caminho, file_id) registradas logo
+            após o upload, usadas pela limpeza em segundo plano; calculadas
+            no início do processamento se omitidas
 
     Processamento:
         1. Abre o vídeo e o template usando OpenCV
-        2. Analisa frame a frame usando cv2.matchTemplate()
+        2. Analisa um a cada FRAME_STRIDE frames usando cv2.matchTemplate()
+           sobre uma pirâmide de imagens (busca reduzida e confirmação em
+           resolução total); os demais são apenas avançados com cap.grab().
+           A decodificação e a correspondência rodam em threads separadas
+           (ver scan_video) ou, havendo GPU com cudacodec, inteiramente na
+           GPU (ver scan_video_cuda)
         3. Emite eventos via Socket.IO com os resultados:
-            - template_found: Quando o template é encontrado
+            - template_found: Quando o template é encontrado (com
+              ROI_TRACKING ativo, o frame reportado pode ser alguns frames
+              posterior ao primeiro em que o template aparece)
+            - processing_progress: Periodicamente durante a análise
             - template_not_found: Quando não encontrado após todo o vídeo
             - processing_error: Em caso de erros
 
     Logs:
         - INFO: Início do processamento e resultados
-        - DEBUG: Progresso a cada 100 frames
+        - DEBUG: Progresso a cada PROGRESS_INTERVAL segundos
         - ERROR: Falhas durante o processamento
     """
+    if uploads is None:
+        uploads = [(path, file_id(path)) for path in (video_path, template_path)]
+
     try:
-        app.logger.info(f"Iniciando processamento do vídeo: {video_path}")
-        start_time = datetime.now()
+        app.logger.info("Iniciando processamento do vídeo: %s", video_path)
+        start_time = time.monotonic()
 
         cap = cv2.VideoCapture(video_path)
+        # Mantém apenas um frame no buffer interno do backend de captura
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
         if not cap.isOpened():
-            app.logger.error(f"Não foi possível abrir o vídeo: {video_path}")
+            app.logger.error("Não foi possível abrir o vídeo: %s", video_path)
             socketio.emit("processing_error", {"message": "Erro ao abrir o vídeo"})
             return
 
-        template = cv2.imread(template_path, 0)
+        template, template_small = load_template(template_path, template_digest)
 
         if template is None:
-            app.logger.error(f"Não foi possível abrir o template: {template_path}")
+            app.logger.error("Não foi possível abrir o template: %s", template_path)
             socketio.emit("processing_error", {"message": "Erro ao abrir o template"})
             cap.release()
             return
 
         # Obter o total de frames para progresso (opcional)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        w, h = template.shape[::-1]
-        frame_num = 0
-        found = False
+        on_progress = ProgressReporter(total_frames)
+        frame_num = None
+        scanned = False
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_num += 1
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            res = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
-            loc = (res >= threshold).any()
-
-            if loc:
-                processing_time = (datetime.now() - start_time).total_seconds()
-                app.logger.info(
-                    f"Template encontrado no frame {frame_num}. Tempo de processamento: {processing_time:.2f}s"
+        if CUDA_DECODE_AVAILABLE:
+            try:
+                frame_num = scan_video_cuda(
+                    video_path, template, threshold, on_progress
                 )
-                socketio.emit(
-                    "template_found",
-                    {
-                        "frame": frame_num,
-                        "processing_time": processing_time,
-                        "total_frames": total_frames,
-                    },
-                    callback=lambda: app.logger.debug(
-                        "Confirmação de recebimento do cliente"
-                    ),
+                scanned = True
+            except cv2.error as e:
+                app.logger.warning(
+                    "Decodificação na GPU indisponível, usando a CPU: %s", e
                 )
-                found = True
-                break
+
+        if not scanned:
+            frame_num = scan_video(
+                cap, template, threshold, on_progress, template_small
+            )
 
         cap.release()
 
-        if not found:
-            processing_time = (datetime.now() - start_time).total_seconds()
+        if frame_num is not None:
+            processing_time = time.monotonic() - start_time
+            app.logger.info(
+                "Template encontrado no frame %d. Tempo de processamento: %.2fs",
+                frame_num,
+                processing_time,
+            )
+            socketio.emit(
+                "template_found",
+                {
+                    "frame": frame_num,
+                    "processing_time": processing_time,
+                    "total_frames": total_frames,
+                },
+                callback=_ack,
+            )
+        else:
+            processing_time = time.monotonic() - start_time
             app.logger.info(
-                f"Template não encontrado. Tempo total: {processing_time:.2f}s"
+                "Template não encontrado. Tempo total: %.2fs", processing_time
             )
             socketio.emit(
                 "template_not_found",
                 {"total_frames": total_frames, "processing_time": processing_time},
-                callback=lambda: app.logger.debug(
-                    "Confirmação de recebimento do cliente"
-                ),
+                callback=_ack,
             )
 
     except Exception as e:
-        app.logger.error(
-            f"Erro durante o processamento do vídeo: {str(e)}", exc_info=True
-        )
+        app.logger.error("Erro durante o processamento do vídeo: %s", e, exc_info=True)
         socketio.emit("processing_error", {"message": str(e)})
 
     finally:
-        # Limpeza de arquivos temporários
-        try:
-            os.remove(video_path)
-            os.remove(template_path)
-            app.logger.info(
-                f"Arquivos temporários removidos: {video_path}, {template_path}"
-            )
-        except Exception as e:
-            app.logger.warning(f"Erro ao remover arquivos temporários: {str(e)}")
+        # Limpeza de arquivos temporários, feita fora desta thread
+        cleanup_queue.put(uploads)
 
 
 if __name__ == "__main__":